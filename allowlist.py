@@ -0,0 +1,182 @@
+# allowlist.py
+
+import os
+import re
+import sys
+import mmap
+import heapq
+import struct
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Заголовок: магия, алгоритм (дополненный нулями), число записей.
+# Дальше — отсортированные сырые дайджесты фиксированной длины.
+_MAGIC  = b"BIALW1"
+_HEADER = struct.Struct("<6s10sQ")
+DIGEST_SIZES = {"md5": 16, "sha1": 20, "sha256": 32}
+# Объём сырых дайджестов в одной порции сортировки при сборке индекса
+RUN_BYTES = 64 * 1024 * 1024
+
+
+class AllowlistIndex:
+    """
+    Индекс известных чистых хешей: отсортированный бинарный файл,
+    отображённый в память. Поиск — бинарный, без загрузки файла в RAM.
+    """
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Allowlist index is empty: {path}")
+        if len(self._mm) < _HEADER.size:
+            self.close()
+            raise ValueError(f"Allowlist index is truncated: {path}")
+        magic, algo, count = _HEADER.unpack_from(self._mm, 0)
+        self.algo = algo.rstrip(b"\0").decode("ascii", errors="replace")
+        if magic != _MAGIC or self.algo not in DIGEST_SIZES:
+            self.close()
+            raise ValueError(f"Not an allowlist index: {path}")
+        self.count  = count
+        self.width  = DIGEST_SIZES[self.algo]
+        if len(self._mm) < _HEADER.size + count * self.width:
+            self.close()
+            raise ValueError(f"Allowlist index is truncated: {path}")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def contains(self, hexdigest: Optional[str]) -> bool:
+        if not hexdigest or len(hexdigest) != self.width * 2:
+            return False
+        try:
+            key = bytes.fromhex(hexdigest)
+        except ValueError:
+            return False
+        mm, width, base = self._mm, self.width, _HEADER.size
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            off = base + mid * width
+            cur = mm[off:off + width]
+            if cur < key:
+                lo = mid + 1
+            elif cur > key:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def __contains__(self, hexdigest: str) -> bool:
+        return self.contains(hexdigest)
+
+    def close(self):
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+
+def read_feed(path: str, algo: str = "sha256") -> Iterable[str]:
+    """
+    Достать хеши нужной длины из фида: простой список по строке
+    или CSV в духе NSRL RDS (берётся первое совпадение в строке).
+    """
+    pattern = re.compile(rf"\b[0-9a-fA-F]{{{DIGEST_SIZES[algo] * 2}}}\b")
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            m = pattern.search(line)
+            if m:
+                yield m.group(0)
+
+
+def _write_run(digests: list, directory: str) -> str:
+    digests.sort()
+    fd, path = tempfile.mkstemp(prefix="allowlist-", suffix=".run", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        for i in range(0, len(digests), 65536):
+            f.write(b"".join(digests[i:i + 65536]))
+    return path
+
+
+def _read_run(path: str, width: int):
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(width * 65536)
+            if not block:
+                return
+            for i in range(0, len(block), width):
+                yield block[i:i + width]
+
+
+def build_index(out_path: str, hexdigests: Iterable[str], algo: str = "sha256",
+                run_bytes: int = RUN_BYTES) -> int:
+    """
+    Собрать индекс из хешей: внешняя сортировка (отсортированные порции по
+    run_bytes во временных файлах, затем слияние с дедупликацией) и атомарная
+    запись. Память не зависит от размера фида.
+    """
+    if algo not in DIGEST_SIZES:
+        raise ValueError(f"Unsupported allowlist algorithm: {algo}")
+    width    = DIGEST_SIZES[algo]
+    run_size = max(1, run_bytes // width)
+    out = Path(out_path)
+    tmp = out.with_suffix(out.suffix + ".tmp")
+    runs, digests = [], []
+    try:
+        for h in hexdigests:
+            try:
+                raw = bytes.fromhex(h.strip())
+            except ValueError:
+                continue
+            if len(raw) == width:
+                digests.append(raw)
+                if len(digests) >= run_size:
+                    runs.append(_write_run(digests, out.parent))
+                    digests = []
+        digests.sort()
+
+        # Число записей известно только после слияния — заголовок дописывается в конце
+        count, prev = 0, None
+        with open(tmp, "wb") as f:
+            f.write(b"\0" * _HEADER.size)
+            merged = heapq.merge(digests, *(_read_run(p, width) for p in runs))
+            for raw in merged:
+                if raw != prev:
+                    f.write(raw)
+                    prev = raw
+                    count += 1
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, algo.encode("ascii"), count))
+        tmp.replace(out)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    finally:
+        for p in runs:
+            os.unlink(p)
+    logger.info(f"Allowlist index {out}: {count} {algo} entries")
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a BlackICE known-good allowlist index")
+    parser.add_argument("output", help="index file to write")
+    parser.add_argument("feeds", nargs="+", help="hash lists or NSRL-style CSV files")
+    parser.add_argument("--algo", choices=sorted(DIGEST_SIZES), default="sha256")
+    args = parser.parse_args(argv)
+
+    hashes = (h for feed in args.feeds for h in read_feed(feed, args.algo))
+    count  = build_index(args.output, hashes, args.algo)
+    print(f"{count} entries written to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
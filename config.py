@@ -8,7 +8,18 @@ class ConfigManager:
     DEFAULTS = {
         "vt_api_key":         "",
         "db_path":            "blackice.db",
-        "log_retention_days": 30
+        "log_retention_days": 30,
+        "scan_routes":        {},
+        "checkpoint_interval": 2,
+        "scan_priority":      {},
+        "max_logs_per_scan":  10000,
+        "maintenance_interval": 3600,
+        "allowlist_path":     "",
+        "scan_io_mode":       "buffered",
+        "scan_io_chunk_size": 1048576,
+        "scan_io_throttle":   0,
+        "signatures_file":    "signatures.json",
+        "fuzzy_threshold":    60
     }
 
     def __new__(cls):
@@ -1,7 +1,10 @@
+import json
+import time
 import sqlite3
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
 from threading import Lock
+from typing import Callable, Optional
 
 class DatabaseManager:
     """
@@ -15,12 +18,20 @@ class DatabaseManager:
         hash TEXT PRIMARY KEY
     );
 
+    CREATE TABLE IF NOT EXISTS signature_versions (
+        version     INTEGER PRIMARY KEY,
+        applied_at  TEXT    NOT NULL,
+        added       INTEGER NOT NULL DEFAULT 0,
+        removed     INTEGER NOT NULL DEFAULT 0
+    );
+
     CREATE TABLE IF NOT EXISTS scans (
         id          INTEGER PRIMARY KEY AUTOINCREMENT,
         path        TEXT    NOT NULL,
         start_time  TEXT    NOT NULL,
         end_time    TEXT,
-        result      TEXT
+        result      TEXT,
+        checkpoint  TEXT
     );
 
     CREATE TABLE IF NOT EXISTS alerts (
@@ -29,21 +40,32 @@ class DatabaseManager:
         path      TEXT    NOT NULL,
         level     TEXT    NOT NULL,
         detail    TEXT,
+        meta      TEXT,
         FOREIGN KEY(scan_id) REFERENCES scans(id) ON DELETE CASCADE
     );
 
     CREATE TABLE IF NOT EXISTS logs (
         id         INTEGER PRIMARY KEY AUTOINCREMENT,
         timestamp  TEXT    NOT NULL,
-        message    TEXT    NOT NULL
+        message    TEXT    NOT NULL,
+        scan_id    INTEGER
     );
     """
 
     _INDEXES = """
     CREATE INDEX IF NOT EXISTS idx_scans_start_time ON scans(start_time);
     CREATE INDEX IF NOT EXISTS idx_logs_timestamp    ON logs(timestamp);
+    CREATE INDEX IF NOT EXISTS idx_alerts_scan_id    ON alerts(scan_id);
+    CREATE INDEX IF NOT EXISTS idx_logs_scan_id      ON logs(scan_id, id);
     """
 
+    # Колонки, добавленные после первого релиза схемы: (таблица, колонка, тип)
+    _COLUMNS = (
+        ("scans", "checkpoint", "TEXT"),
+        ("alerts", "meta", "TEXT"),
+        ("logs", "scan_id", "INTEGER"),
+    )
+
     def __init__(self, db_path: str = "blackice.db"):
         self._lock   = Lock()
         self.db_file = Path(db_path)
@@ -51,10 +73,27 @@ class DatabaseManager:
         self.conn    = sqlite3.connect(str(self.db_file), check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
         self.conn.execute("PRAGMA foreign_keys = ON;")
+        if first:
+            # Задаётся до первой записи в файл, иначе нужен полный VACUUM
+            self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+        # WAL: читатели (экспорт, UI) не блокируют запись идущего скана
+        self.conn.execute("PRAGMA journal_mode = WAL;")
         if first:
             with self.conn:
                 self.conn.executescript(self._SCHEMA)
                 self.conn.executescript(self._INDEXES)
+        else:
+            self._migrate()
+
+    def _migrate(self):
+        """Довести схему существующей БД до текущей версии."""
+        with self._lock, self.conn:
+            self.conn.executescript(self._SCHEMA)
+            for table, column, ctype in self._COLUMNS:
+                cols = {row["name"] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+                if column not in cols:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ctype}")
+            self.conn.executescript(self._INDEXES)
 
     def close(self):
         with self._lock:
@@ -85,24 +124,56 @@ class DatabaseManager:
         with self._lock, self.conn:
             self.conn.execute(sql, params)
 
+    def checkpoint_scan(self, scan_id: int, done: int, total: int, results: list):
+        """
+        Зафиксировать прогресс скана одной транзакцией: вердикты файлов,
+        обработанных с прошлого чекпоинта, — [(path, level, detail, meta)],
+        по ним же и возобновляется скан, — и счётчик done/total для списка
+        незавершённых сканов.
+        """
+        checkpoint = json.dumps({"done": done, "total": total, "time": self._now()})
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO alerts(scan_id, path, level, detail, meta) VALUES (?, ?, ?, ?, ?)",
+                ((scan_id, *r) for r in results)
+            )
+            self.conn.execute(
+                "UPDATE scans SET checkpoint = ? WHERE id = ?", (checkpoint, scan_id)
+            )
+
+    def get_unfinished_scans(self):
+        """Сканы без end_time (прерваны падением/перезагрузкой), новые первыми."""
+        with self._lock:
+            cur = self.conn.execute(
+                "SELECT id, path, start_time, checkpoint FROM scans "
+                "WHERE end_time IS NULL ORDER BY start_time DESC"
+            )
+            return [dict(row) for row in cur.fetchall()]
+
+    def get_completed_files(self, scan_id: int) -> set:
+        """Пути, уже обработанные сканом: у каждого есть записанный вердикт."""
+        with self._lock:
+            cur = self.conn.execute("SELECT path FROM alerts WHERE scan_id = ?", (scan_id,))
+            return {row[0] for row in cur}
+
     def add_scan(self, path: str, result: str) -> int:
         sid = self.start_scan(path)
         self.finish_scan(sid, result)
         return sid
 
-    def add_alert(self, scan_id: int, path: str, level: str, detail: str = ""):
+    def add_alert(self, scan_id: int, path: str, level: str, detail: str = "", meta: str = None):
         with self._lock, self.conn:
             self.conn.execute(
-                "INSERT INTO alerts(scan_id, path, level, detail) VALUES (?, ?, ?, ?)",
-                (scan_id, path, level, detail)
+                "INSERT INTO alerts(scan_id, path, level, detail, meta) VALUES (?, ?, ?, ?, ?)",
+                (scan_id, path, level, detail, meta)
             )
 
-    def add_log(self, message: str):
+    def add_log(self, message: str, scan_id: int = None):
         ts = self._now()
         with self._lock, self.conn:
             self.conn.execute(
-                "INSERT INTO logs(timestamp, message) VALUES (?, ?)",
-                (ts, message)
+                "INSERT INTO logs(timestamp, message, scan_id) VALUES (?, ?, ?)",
+                (ts, message, scan_id)
             )
 
     def get_scan_logs(self):
@@ -128,14 +199,123 @@ class DatabaseManager:
             )
         return cur.fetchall()
 
+    def get_scan(self, scan_id: int):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id, path, start_time, end_time, result FROM scans WHERE id = ?",
+                (scan_id,)
+            ).fetchone()
+            return dict(row) if row else None
+
+    def iter_alerts(self, scan_id: int, chunk_size: int = 1000):
+        """
+        Потоково отдать алерты скана порциями по chunk_size.
+        Отдельное read-only соединение: общий lock не держится,
+        а в режиме WAL чтение не мешает записи идущих сканов.
+        """
+        conn = sqlite3.connect(f"{self.db_file.resolve().as_uri()}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            cur = conn.execute(
+                "SELECT id, path, level, detail, meta FROM alerts WHERE scan_id = ? ORDER BY id",
+                (scan_id,)
+            )
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
     def get_logs(self):
         cur = self.conn.execute("SELECT timestamp, message FROM logs ORDER BY id DESC")
         return cur.fetchall()
 
-    def purge_logs_older_than(self, days: int):
+    def _delete_in_batches(self, select_ids: str, params: tuple, batch_size: int, pause: float,
+                           should_stop: Optional[Callable[[], bool]] = None) -> int:
+        """
+        Удалять строки logs порциями: каждая порция — своя короткая транзакция,
+        между порциями lock отпускается, чтобы запись скана не простаивала.
+        should_stop проверяется между порциями.
+        """
+        sql   = f"DELETE FROM logs WHERE id IN ({select_ids} LIMIT ?)"
+        total = 0
+        while not (should_stop and should_stop()):
+            with self._lock, self.conn:
+                deleted = self.conn.execute(sql, (*params, batch_size)).rowcount
+            total += deleted
+            if deleted < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+        return total
+
+    def purge_logs_older_than(self, days: int, batch_size: int = 1000, pause: float = 0.0,
+                              should_stop: Optional[Callable[[], bool]] = None) -> int:
         cutoff     = datetime.now(timezone.utc) - timedelta(days=days)
         cutoff_str = cutoff.isoformat(sep=" ", timespec="seconds")
-        with self._lock, self.conn:
-            self.conn.execute(
-                "DELETE FROM logs WHERE timestamp <= ?", (cutoff_str,)
-            )
+        return self._delete_in_batches(
+            "SELECT id FROM logs WHERE timestamp <= ?", (cutoff_str,), batch_size, pause, should_stop
+        )
+
+    def cap_scan_logs(self, max_rows: int, batch_size: int = 1000, pause: float = 0.0,
+                      should_stop: Optional[Callable[[], bool]] = None, scan_batch: int = 50) -> int:
+        """
+        Оставить у каждого скана не больше max_rows последних строк лога.
+        Сканы обходятся порциями по id; порог для каждого — короткий проход
+        по индексу (scan_id, id), без агрегации по всей таблице под lock.
+        """
+        total, last_id = 0, 0
+        while not (should_stop and should_stop()):
+            with self._lock:
+                scan_ids = [row[0] for row in self.conn.execute(
+                    "SELECT id FROM scans WHERE id > ? ORDER BY id LIMIT ?", (last_id, scan_batch)
+                )]
+            if not scan_ids:
+                break
+            last_id = scan_ids[-1]
+            for scan_id in scan_ids:
+                if should_stop and should_stop():
+                    return total
+                with self._lock:
+                    row = self.conn.execute(
+                        "SELECT id FROM logs WHERE scan_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?",
+                        (scan_id, max_rows - 1)
+                    ).fetchone()
+                if row is None:
+                    continue
+                total += self._delete_in_batches(
+                    "SELECT id FROM logs WHERE scan_id = ? AND id < ?",
+                    (scan_id, row[0]), batch_size, pause, should_stop
+                )
+        return total
+
+    def incremental_vacuum(self, pages: int = 256, max_steps: int = 64, pause: float = 0.0,
+                           should_stop: Optional[Callable[[], bool]] = None) -> int:
+        """
+        Вернуть свободные страницы ОС порциями по pages.
+        Работает только для БД с auto_vacuum = INCREMENTAL (создаются так с этой версии).
+        """
+        with self._lock:
+            if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                return 0
+        freed = 0
+        for _ in range(max_steps):
+            if should_stop and should_stop():
+                break
+            with self._lock:
+                free = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if not free:
+                    break
+                self.conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+                freed += min(free, pages)
+            if pause:
+                time.sleep(pause)
+        return freed
+
+    def optimize(self, analysis_limit: int = 400):
+        """PRAGMA optimize с ограниченной выборкой ANALYZE — чтобы не держать lock долго."""
+        with self._lock:
+            self.conn.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+            self.conn.execute("PRAGMA optimize")
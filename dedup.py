@@ -0,0 +1,54 @@
+# dedup.py
+
+import os
+import logging
+from collections import Counter
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Verdict = Tuple[str, str]
+
+
+class DuplicateIndex:
+    """
+    Поиск дубликатов в пределах одного скана.
+    Жёсткие ссылки узнаются по inode (только stat), копии — по sha256.
+    Вердикт переиспользуется, только если маршрут анализа тот же:
+    .txt с тем же содержимым не отдаёт свой «VT skipped» вердикт .php-файлу.
+    """
+    def __init__(self):
+        self._sizes   = Counter()
+        self._inodes  = {}  # (st_dev, st_ino, расширение) -> verdict
+        self._content = {}  # (этапы, sha256) -> verdict
+
+    def add_size(self, size: int):
+        """Учесть размер файла на этапе перечисления."""
+        self._sizes[size] += 1
+
+    @staticmethod
+    def _inode_key(filepath: str, st: os.stat_result):
+        if st.st_ino == 0 or st.st_nlink < 2:
+            return None
+        # Тип (а значит, и маршрут) для одного содержимого зависит только от расширения
+        return st.st_dev, st.st_ino, os.path.splitext(filepath)[1].lower()
+
+    def by_inode(self, filepath: str, st: os.stat_result) -> Optional[Verdict]:
+        """Вердикт для жёсткой ссылки на уже проверенный файл — стоит только stat."""
+        key = self._inode_key(filepath, st)
+        return self._inodes.get(key) if key else None
+
+    def has_same_size(self, st: os.stat_result) -> bool:
+        """Есть ли в скане другие файлы того же размера (иначе копий быть не может)."""
+        return self._sizes[st.st_size] > 1
+
+    def by_content(self, stages: tuple, sha256: Optional[str]) -> Optional[Verdict]:
+        return self._content.get((stages, sha256)) if sha256 else None
+
+    def record(self, filepath: str, st: os.stat_result, stages: tuple,
+               sha256: Optional[str], verdict: Verdict):
+        key = self._inode_key(filepath, st)
+        if key:
+            self._inodes[key] = verdict
+        if sha256 and self.has_same_size(st):
+            self._content[(stages, sha256)] = verdict
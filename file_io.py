@@ -0,0 +1,144 @@
+# file_io.py
+
+import os
+import mmap
+import time
+import logging
+from typing import Optional, Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+IO_BUFFERED = "buffered"  # обычный open(), как раньше
+IO_STREAM   = "stream"    # большие выровненные чтения + fadvise
+# Отображение файла + madvise/fadvise. Небезопасно для «живых» деревьев:
+# если другой процесс обрежет файл, обращение к странице за новым концом
+# даёт SIGBUS. Размер перепроверяется на каждой порции, но окно гонки
+# остаётся — для каталогов, которые меняются во время скана, берите stream.
+IO_MMAP     = "mmap"
+IO_MODES    = (IO_BUFFERED, IO_STREAM, IO_MMAP)
+
+PAGE_SIZE = mmap.PAGESIZE
+# Как часто сбрасывать уже прочитанное из page cache внутри большого файла
+DROP_EVERY = 64 * 1024 * 1024
+# Максимальный шаг сна троттлинга — чтобы остановка скана оставалась быстрой
+SLEEP_STEP = 0.05
+
+_HAS_FADVISE = hasattr(os, "posix_fadvise")
+
+
+class ScanCancelled(Exception):
+    """Скан остановлен посреди чтения файла."""
+
+
+class Throttle:
+    """Ограничение скорости чтения в байтах в секунду (общее на весь скан)."""
+    def __init__(self, bytes_per_sec: int):
+        self.rate  = bytes_per_sec
+        self._next = time.monotonic()
+
+    def consume(self, nbytes: int, should_stop: Optional[Callable[[], bool]] = None):
+        now = time.monotonic()
+        self._next = max(self._next, now) + nbytes / self.rate
+        while True:
+            delay = self._next - time.monotonic()
+            if delay <= 0:
+                return
+            if should_stop is not None and should_stop():
+                raise ScanCancelled()
+            time.sleep(min(delay, SLEEP_STEP))
+
+
+def _fadvise(fd: int, offset: int, length: int, advice_name: str):
+    if not _HAS_FADVISE:
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, getattr(os, advice_name))
+    except (OSError, AttributeError):
+        pass
+
+
+def _aligned(size: int) -> int:
+    return max(PAGE_SIZE, (size + PAGE_SIZE - 1) // PAGE_SIZE * PAGE_SIZE)
+
+
+def _read_buffered(filepath, chunk_size):
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            yield chunk
+
+
+def _read_stream(filepath, chunk_size):
+    chunk_size = _aligned(chunk_size)
+    fd = os.open(filepath, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        _fadvise(fd, 0, 0, "POSIX_FADV_SEQUENTIAL")
+        buf  = bytearray(chunk_size)
+        view = memoryview(buf)
+        offset, dropped = 0, 0
+        with os.fdopen(fd, "rb", buffering=0, closefd=False) as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                yield view[:n]
+                offset += n
+                if offset - dropped >= DROP_EVERY:
+                    _fadvise(fd, dropped, offset - dropped, "POSIX_FADV_DONTNEED")
+                    dropped = offset
+    finally:
+        _fadvise(fd, 0, 0, "POSIX_FADV_DONTNEED")
+        os.close(fd)
+
+
+def _read_mmap(filepath, chunk_size):
+    chunk_size = _aligned(chunk_size)
+    with open(filepath, "rb") as f:
+        fd = f.fileno()
+        try:
+            if os.fstat(fd).st_size == 0:
+                return
+            resume_at = None
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                for offset in range(0, len(mm), chunk_size):
+                    if os.fstat(fd).st_size < len(mm):
+                        # Файл обрезали — отображение больше трогать нельзя
+                        logger.warning(f"{filepath} shrank during mmap read, switching to plain reads")
+                        resume_at = offset
+                        break
+                    yield mm[offset:offset + chunk_size]
+                if hasattr(mm, "madvise") and hasattr(mmap, "MADV_DONTNEED"):
+                    mm.madvise(mmap.MADV_DONTNEED)
+            if resume_at is not None:
+                f.seek(resume_at)
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    yield chunk
+        finally:
+            _fadvise(fd, 0, 0, "POSIX_FADV_DONTNEED")
+
+
+_READERS = {
+    IO_BUFFERED: _read_buffered,
+    IO_STREAM:   _read_stream,
+    IO_MMAP:     _read_mmap,
+}
+
+
+def read_chunks(filepath: str, io_mode: str = IO_BUFFERED, chunk_size: int = 65536,
+                throttle: Optional[Throttle] = None,
+                should_stop: Optional[Callable[[], bool]] = None) -> Iterator[bytes]:
+    """
+    Читать файл порциями в выбранном режиме. Порция валидна только до
+    следующей итерации (в режиме stream буфер переиспользуется).
+    should_stop проверяется на каждой порции и во время сна троттлинга.
+    """
+    reader = _READERS.get(io_mode)
+    if reader is None:
+        raise ValueError(f"Unsupported I/O mode: {io_mode}")
+    for chunk in reader(filepath, chunk_size):
+        if should_stop is not None and should_stop():
+            raise ScanCancelled(filepath)
+        yield chunk
+        if throttle is not None:
+            throttle.consume(len(chunk), should_stop)
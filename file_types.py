@@ -0,0 +1,173 @@
+# file_types.py
+
+import os
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SNIFF_SIZE = 4096
+
+# Этапы анализа
+STAGE_HASH       = "hash"
+STAGE_SIGNATURES = "signatures"
+STAGE_FUZZY      = "fuzzy"
+STAGE_YARA       = "yara"
+STAGE_VT         = "vt"
+
+FULL_ANALYSIS = (STAGE_HASH, STAGE_SIGNATURES, STAGE_FUZZY, STAGE_YARA, STAGE_VT)
+HASH_ONLY     = (STAGE_HASH, STAGE_SIGNATURES)
+
+# Сигнатуры по первым байтам: (смещение, магия, тип)
+_MAGIC = (
+    (0, b"MZ",                 "pe"),
+    (0, b"\x7fELF",            "elf"),
+    (0, b"\xfe\xed\xfa\xce",   "macho"),
+    (0, b"\xfe\xed\xfa\xcf",   "macho"),
+    (0, b"\xce\xfa\xed\xfe",   "macho"),
+    (0, b"\xcf\xfa\xed\xfe",   "macho"),
+    (0, b"\xca\xfe\xba\xbe",   "macho"),
+    (0, b"dex\n",              "dex"),
+    (0, b"#!",                 "script"),
+    (0, b"PK\x03\x04",         "archive"),
+    (0, b"Rar!\x1a\x07",       "archive"),
+    (0, b"7z\xbc\xaf\x27\x1c", "archive"),
+    (0, b"\x1f\x8b",           "archive"),
+    (0, b"BZh",                "archive"),
+    (0, b"\xfd7zXZ\x00",       "archive"),
+    (0, b"MSCF",               "archive"),
+    (257, b"ustar",            "archive"),
+    (0, b"%PDF",               "document"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "document"),
+    (0, b"{\\rtf",             "document"),
+    (0, b"SQLite format 3\x00", "database"),
+    (0, b"\x89PNG\r\n\x1a\n",  "image"),
+    (0, b"\xff\xd8\xff",       "image"),
+    (0, b"GIF87a",             "image"),
+    (0, b"GIF89a",             "image"),
+    (0, b"BM",                 "image"),
+    (0, b"\x1aE\xdf\xa3",      "video"),
+    (4, b"ftyp",               "video"),
+    (0, b"FLV",                "video"),
+    (0, b"\x00\x00\x01\xba",   "video"),
+    (0, b"ID3",                "audio"),
+    (0, b"fLaC",               "audio"),
+    (0, b"OggS",               "audio"),
+)
+
+# RIFF-контейнеры различаются по форме на смещении 8
+_RIFF_FORMS = {
+    b"AVI ": "video",
+    b"WAVE": "audio",
+    b"WEBP": "image",
+}
+
+# Текстовые файлы с этими расширениями исполняемы интерпретатором/браузером
+SCRIPT_EXTENSIONS = {
+    ".ps1", ".psm1", ".vbs", ".vbe", ".js", ".jse", ".wsf", ".hta",
+    ".bat", ".cmd", ".py", ".pl", ".rb", ".sh", ".php",
+    ".html", ".htm", ".xhtml", ".mht", ".mhtml", ".svg", ".xsl",
+    ".psd1", ".vba", ".vb", ".lua", ".reg", ".inf", ".url", ".lnk", ".desktop",
+    ".scf", ".sct", ".wsh", ".csproj", ".vbproj", ".proj", ".targets", ".xaml",
+}
+
+# Текст с этими расширениями считается пассивным (логи, данные) и получает
+# урезанный анализ. Любой другой текст идёт на полный — конфиги загрузчиков,
+# проекты сборки и прочие интерпретируемые форматы слишком разнообразны.
+PASSIVE_TEXT_EXTENSIONS = {
+    ".log", ".txt", ".csv", ".tsv", ".md", ".rst", ".json", ".jsonl",
+    ".yaml", ".yml", ".toml", ".ini", ".cfg", ".conf", ".srt", ".po",
+}
+
+# Расширения нативных исполняемых файлов и библиотек
+EXECUTABLE_EXTENSIONS = {
+    ".exe", ".dll", ".sys", ".scr", ".com", ".cpl", ".ocx", ".msi",
+    ".so", ".dylib", ".elf",
+}
+
+# Разметка, способная исполнять код, — анализируется как скрипт
+_MARKUP_MARKERS = (b"<script", b"<svg", b"<html", b"<!doctype html", b"<?php", b"<hta:")
+
+# Типы, которым по умолчанию достаётся урезанный анализ. Если у такого файла
+# расширение скрипта или исполняемого — это полиглот (GIF89a=...;/* в .js),
+# и он должен пройти полный анализ.
+_PASSIVE_TYPES = {"image", "video", "audio", "database", "text"}
+
+# Таблица маршрутизации: тип файла -> этапы анализа
+ROUTES = {
+    "pe":       FULL_ANALYSIS,
+    "elf":      FULL_ANALYSIS,
+    "macho":    FULL_ANALYSIS,
+    "dex":      FULL_ANALYSIS,
+    "script":   FULL_ANALYSIS,
+    "archive":  FULL_ANALYSIS,
+    "document": FULL_ANALYSIS,
+    "unknown":  FULL_ANALYSIS,
+    "image":    HASH_ONLY,
+    "video":    HASH_ONLY,
+    "audio":    HASH_ONLY,
+    "database": HASH_ONLY,
+    "text":     HASH_ONLY,
+    "empty":    (),
+}
+
+
+def _looks_like_text(head: bytes) -> bool:
+    if b"\x00" in head:
+        return False
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # Обрезанный многобайтовый символ в конце буфера — всё ещё текст
+        if e.start < len(head) - 3:
+            return False
+    return True
+
+
+def _sniff(head: bytes) -> str:
+    for offset, magic, ftype in _MAGIC:
+        if head[offset:offset + len(magic)] == magic:
+            return ftype
+    if head[:4] == b"RIFF":
+        return _RIFF_FORMS.get(head[8:12], "unknown")
+    if _looks_like_text(head):
+        lowered = head.lower()
+        return "script" if any(m in lowered for m in _MARKUP_MARKERS) else "text"
+    return "unknown"
+
+
+def classify_bytes(head: bytes, filepath: str = "") -> str:
+    """
+    Определить тип файла по первым байтам. Расширение скрипта или
+    исполняемого файла перекрывает «безобидную» магию (медиа, БД, текст);
+    текст остаётся «text» только с пассивным расширением.
+    """
+    if not head:
+        return "empty"
+    ftype = _sniff(head)
+    if ftype in _PASSIVE_TYPES:
+        ext = os.path.splitext(filepath)[1].lower()
+        if ext in SCRIPT_EXTENSIONS:
+            return "script"
+        if ext in EXECUTABLE_EXTENSIONS:
+            return "unknown"
+        if ftype == "text" and ext not in PASSIVE_TEXT_EXTENSIONS:
+            return "unknown"
+    return ftype
+
+
+def classify(filepath: str, sniff_size: int = SNIFF_SIZE) -> str:
+    """Прочитать первые sniff_size байт файла один раз и вернуть его тип."""
+    try:
+        with open(filepath, "rb") as f:
+            head = f.read(sniff_size)
+    except OSError as e:
+        logger.warning(f"Classify failed for {filepath}: {e}")
+        return "unknown"
+    return classify_bytes(head, filepath)
+
+
+def stages_for(ftype: str, routes: Optional[dict] = None) -> tuple:
+    """Этапы анализа для типа; неизвестные типы получают полный анализ."""
+    table = ROUTES if routes is None else {**ROUTES, **routes}
+    return tuple(table.get(ftype, FULL_ANALYSIS))
@@ -0,0 +1,159 @@
+# fuzzy_index.py
+
+import re
+import json
+import heapq
+import bisect
+import logging
+from array import array
+from collections import Counter
+from typing import Optional, Tuple
+
+try:
+    import ssdeep
+except ImportError:  # нечёткое хеширование просто отключается
+    ssdeep = None
+
+logger = logging.getLogger(__name__)
+
+FUZZY_AVAILABLE = ssdeep is not None
+
+# ssdeep даёт ненулевую оценку, только если есть общая подстрока длины 7
+NGRAM = 7
+# Сколько лучших кандидатов сравнивать точной функцией
+MAX_CANDIDATES = 32
+# N-граммы с более длинными списками (общие шаблоны) при поиске пропускаются
+MAX_POSTINGS = 1024
+
+# Постинг — одно 64-битное число: хеш (размер блока, n-грамма) в старших
+# битах, id эталона в младших. Отсортированный array('Q') вместо set на ключ.
+ID_BITS  = 26
+ID_MASK  = (1 << ID_BITS) - 1
+KEY_MASK = (1 << (64 - ID_BITS)) - 1
+# Размер отсортированной порции при сборке (число постингов)
+RUN_SIZE = 1 << 20
+
+_REPEATS = re.compile(r"(.)\1{3,}")
+
+
+class FuzzyHasher:
+    """Обёртка над ssdeep.Hash с интерфейсом hashlib (update/hexdigest)."""
+    def __init__(self):
+        if ssdeep is None:
+            raise ValueError("Fuzzy hashing requires the 'ssdeep' package")
+        self._h = ssdeep.Hash()
+
+    def update(self, chunk):
+        self._h.update(bytes(chunk))
+
+    def hexdigest(self) -> str:
+        return self._h.digest()
+
+
+def _parse(signature: str) -> Optional[Tuple[int, str, str]]:
+    try:
+        bs, s1, s2 = signature.strip().split(":", 2)
+        bs = int(bs)
+    except ValueError:
+        return None
+    # Как в ssdeep: серии из >3 одинаковых символов сжимаются до трёх
+    return bs, _REPEATS.sub(r"\1\1\1", s1), _REPEATS.sub(r"\1\1\1", s2.split(",")[0])
+
+
+def _ngrams(part: str):
+    return {part[i:i + NGRAM] for i in range(len(part) - NGRAM + 1)}
+
+
+def _keys(bs: int, s1: str, s2: str):
+    """Ключи n-грамм сигнатуры. hash() строк стабилен в пределах процесса —
+    индекс живёт только в памяти, этого достаточно."""
+    keys = {hash((bs, g)) & KEY_MASK for g in _ngrams(s1)}
+    keys.update(hash((bs * 2, g)) & KEY_MASK for g in _ngrams(s2))
+    return keys
+
+
+class FuzzyIndex:
+    """
+    Индекс CTPH-сигнатур по n-граммам: (размер блока, 7-грамма) -> id эталонов.
+    Постинги хранятся упакованными в один отсортированный array('Q')
+    (8 байт на n-грамму эталона); поиск — бинарный по каждой n-грамме
+    запроса, точная оценка ssdeep считается лишь для лучших кандидатов.
+    """
+    def __init__(self):
+        self._refs     = []            # id -> сигнатура
+        self._families = array("I")    # id -> номер семейства
+        self._names    = []            # номер -> семейство
+        self._name_ids = {}
+        self._postings = array("Q")    # отсортированные (ключ << ID_BITS) | id
+        self._pending  = array("Q")    # добавленные после последней сборки
+
+    def __len__(self) -> int:
+        return len(self._refs)
+
+    def add(self, signature: str, family: str):
+        parsed = _parse(signature)
+        if parsed is None:
+            logger.warning(f"Bad fuzzy signature skipped: {signature}")
+            return
+        ref_id = len(self._refs)
+        if ref_id > ID_MASK:
+            raise ValueError(f"Fuzzy index is full ({ID_MASK + 1} signatures)")
+        if family not in self._name_ids:
+            self._name_ids[family] = len(self._names)
+            self._names.append(family)
+        self._refs.append(signature.strip())
+        self._families.append(self._name_ids[family])
+        self._pending.extend(key << ID_BITS | ref_id for key in _keys(*parsed))
+
+    def freeze(self):
+        """Влить добавленные постинги в отсортированный массив."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, array("Q")
+        runs = [array("Q", sorted(pending[i:i + RUN_SIZE]))
+                for i in range(0, len(pending), RUN_SIZE)]
+        del pending
+        if self._postings:
+            runs.append(self._postings)
+        self._postings = runs[0] if len(runs) == 1 else array("Q", heapq.merge(*runs))
+
+    def lookup(self, signature: Optional[str], threshold: int = 60) -> Optional[Tuple[int, str, str]]:
+        """Лучшее совпадение (оценка, семейство, эталон) с оценкой >= threshold или None."""
+        if ssdeep is None or not signature:
+            return None
+        parsed = _parse(signature)
+        if parsed is None:
+            return None
+        self.freeze()
+        postings = self._postings
+        hits = Counter()
+        for key in _keys(*parsed):
+            lo = bisect.bisect_left(postings, key << ID_BITS)
+            hi = bisect.bisect_left(postings, (key + 1) << ID_BITS, lo)
+            if hi - lo > MAX_POSTINGS:
+                continue
+            hits.update(postings[i] & ID_MASK for i in range(lo, hi))
+
+        best = None
+        for ref_id, _ in hits.most_common(MAX_CANDIDATES):
+            ref   = self._refs[ref_id]
+            score = ssdeep.compare(signature, ref)
+            if score >= threshold and (best is None or score > best[0]):
+                best = (score, self._names[self._families[ref_id]], ref)
+        return best
+
+    @classmethod
+    def from_signatures_json(cls, path: str) -> "FuzzyIndex":
+        """Построить индекс по разделу "ssdeep" файла signatures.json."""
+        index = cls()
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Cannot load fuzzy signatures from {path}: {e}")
+            return index
+        for signature, family in data.get("ssdeep", {}).items():
+            index.add(signature, family)
+        index.freeze()
+        logger.info(f"Fuzzy index: {len(index)} signatures from {path}")
+        return index
@@ -1,9 +1,10 @@
 # gui.py
 
 import sys
+import json
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QHBoxLayout, QVBoxLayout,
-    QPushButton, QStackedWidget, QFileDialog, QMessageBox
+    QPushButton, QStackedWidget, QFileDialog, QMessageBox, QInputDialog
 )
 from PySide6.QtGui import QCursor
 from PySide6.QtCore import Qt
@@ -15,6 +16,10 @@ from constants import (
 )
 from ui_frames import HomeFrame, ScanFrame, AlertFrame, LogsFrame, SettingsFrame
 from scan_worker import ScanWorker
+from hash_utils import HashUtils
+from allowlist import AllowlistIndex
+from fuzzy_index import FuzzyIndex, FUZZY_AVAILABLE
+from report_export import ExportWorker
 
 class MainWindow(QMainWindow):
     def __init__(self, config, db_manager):
@@ -23,6 +28,9 @@ class MainWindow(QMainWindow):
         self.resize(1000, 700)
         self.config = config
         self.db     = db_manager
+        self.hash_utils = HashUtils(str(db_manager.db_file))
+        self.allowlist  = self._load_allowlist()
+        self.fuzzy_index = FuzzyIndex.from_signatures_json(self.config.get("signatures_file")) if FUZZY_AVAILABLE else None
 
         central = QWidget(self)
         self.setCentralWidget(central)
@@ -84,11 +92,22 @@ class MainWindow(QMainWindow):
         scan_frame = self.frames[SCREEN_SCAN]
         scan_frame.btn_file.clicked.connect(self._scan_file)
         scan_frame.btn_folder.clicked.connect(self._scan_folder)
+        scan_frame.btn_resume.clicked.connect(self._resume_scan)
 
+        self.frames[SCREEN_ALERT].export_btn.clicked.connect(self._export_report)
         self.frames[SCREEN_SETTINGS].save_btn.clicked.connect(self._save_settings)
 
         self._switch(SCREEN_HOME)
 
+    def _load_allowlist(self):
+        path=self.config.get("allowlist_path")
+        if not path: return None
+        try:
+            return AllowlistIndex(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self,"Allowlist",f"Cannot open allowlist index: {e}")
+            return None
+
     def _switch(self, screen):
         idx = list(self.frames).index(screen)
         self.stack.setCurrentIndex(idx)
@@ -105,17 +124,74 @@ class MainWindow(QMainWindow):
         path=QFileDialog.getExistingDirectory(self,"Select Folder")
         if path: self._start_scan(path)
 
-    def _start_scan(self,target):
-        scan_id=self.db.start_scan(target)
+    def _resume_scan(self):
+        if getattr(self,"_worker",None) is not None and self._worker.isRunning():
+            QMessageBox.warning(self,"Scan","A scan is already running.")
+            return
+        scans=self.db.get_unfinished_scans()
+        if not scans:
+            QMessageBox.information(self,"Scan","No unfinished scans.")
+            return
+        labels=[f"#{s['id']}  {s['path']}  ({s['start_time']}{self._checkpoint_label(s['checkpoint'])})" for s in scans]
+        choice,ok=QInputDialog.getItem(self,"Resume Scan","Unfinished scans:",labels,0,False)
+        if ok:
+            s=scans[labels.index(choice)]
+            self._start_scan(s["path"],scan_id=s["id"])
+
+    @staticmethod
+    def _checkpoint_label(checkpoint):
+        try:
+            cp=json.loads(checkpoint) if checkpoint else {}
+        except ValueError:
+            cp={}
+        return f", {cp['done']}/{cp['total']} files" if "done" in cp else ""
+
+    def _start_scan(self,target,scan_id=None):
+        resume=scan_id is not None
+        if not resume: scan_id=self.db.start_scan(target)
         sf=self.frames[SCREEN_SCAN]; af=self.frames[SCREEN_ALERT]
         sf.log.clear(); sf.progress.setValue(0); af.tree.clear()
 
-        w=ScanWorker(target,self.config.get("vt_api_key",""))
-        w.log.connect(lambda m:(sf.log.append(m),self.db.add_log(m)))
-        w.file_scanned.connect(lambda p,l:(af.add_alert(p,l),self.db.add_alert(scan_id,p,l)))
+        w=ScanWorker(target,self.config.get("vt_api_key",""),routes=self.config.get("scan_routes"),
+                     db_manager=self.db,scan_id=scan_id,resume=resume,
+                     checkpoint_interval=float(self.config.get("checkpoint_interval")),
+                     priority=self.config.get("scan_priority"),hash_utils=self.hash_utils,
+                     allowlist=self.allowlist,io_mode=self.config.get("scan_io_mode"),
+                     io_chunk_size=int(self.config.get("scan_io_chunk_size")),
+                     io_throttle=int(self.config.get("scan_io_throttle")),
+                     fuzzy_index=self.fuzzy_index,fuzzy_threshold=int(self.config.get("fuzzy_threshold")))
+        w.log.connect(lambda m:(sf.log.append(m),self.db.add_log(m,scan_id)))
+        w.file_scanned.connect(lambda p,l,d,m:af.add_alert(p,l))  # в БД вердикты пишет чекпоинт воркера
         w.finished.connect(lambda:(self.db.finish_scan(scan_id),QMessageBox.information(self,"Scan","Completed"),self._switch(SCREEN_ALERT)))
         self._worker=w; w.start()
 
+    def _export_report(self):
+        if getattr(self,"_export_worker",None) is not None and self._export_worker.isRunning():
+            QMessageBox.warning(self,"Export","An export is already running.")
+            return
+        scans=self.db.get_scan_logs()
+        if not scans:
+            QMessageBox.information(self,"Export","No scans to export.")
+            return
+        labels=[f"#{s['id']}  {s['path']}  ({s['start_time']})" for s in scans]
+        choice,ok=QInputDialog.getItem(self,"Export Report","Scan:",labels,0,False)
+        if not ok: return
+        scan_id=scans[labels.index(choice)]["id"]
+        filters={"CSV (*.csv)":"csv","JSON Lines (*.jsonl)":"jsonl","SARIF (*.sarif.json)":"sarif"}
+        path,flt=QFileDialog.getSaveFileName(self,"Export Report",f"blackice_scan_{scan_id}.csv",";;".join(filters))
+        if not path: return
+
+        w=ExportWorker(self.db,scan_id,path,filters.get(flt))
+        w.done.connect(lambda n:QMessageBox.information(self,"Export",f"Exported {n} records to {path}"))
+        w.failed.connect(lambda e:QMessageBox.warning(self,"Export",f"Export failed: {e}"))
+        self._export_worker=w; w.start()
+
+    def stop_export(self):
+        """Остановить идущий экспорт и дождаться потока (вызывается на aboutToQuit)."""
+        w=getattr(self,"_export_worker",None)
+        if w is not None and w.isRunning():
+            w.stop(); w.wait()
+
     def _save_settings(self):
         k=self.frames[SCREEN_SETTINGS].api_input.text().strip()
         self.config.set("vt_api_key",k)
@@ -127,5 +203,6 @@ if __name__=="__main__":
     from db_manager import DatabaseManager
     app=QApplication(sys.argv)
     win=MainWindow(ConfigManager(),DatabaseManager())
+    app.aboutToQuit.connect(win.stop_export)
     win.show()
     sys.exit(app.exec())
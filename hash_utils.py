@@ -3,57 +3,251 @@
 import sqlite3
 import hashlib
 import logging
+import threading
 from pathlib import Path
-from typing import Optional, Literal
+from typing import Optional, Literal, Iterable, Dict, Callable
+
+from file_io import read_chunks, ScanCancelled, Throttle, IO_BUFFERED
+from fuzzy_index import FuzzyHasher
 
 logger = logging.getLogger(__name__)
 
+class SignatureSet:
+    """
+    Неизменяемый снимок сигнатур версии version.
+    Базовое множество общее для всех снимков; дельты лежат в небольших
+    оверлеях added/removed, поэтому новая версия строится за O(размер дельты).
+    """
+    __slots__ = ("version", "base", "added", "removed")
+
+    def __init__(self, version: int, base: frozenset,
+                 added: frozenset = frozenset(), removed: frozenset = frozenset()):
+        self.version = version
+        self.base    = base
+        self.added   = added
+        self.removed = removed
+
+    def __contains__(self, hexdigest: str) -> bool:
+        if hexdigest in self.added:
+            return True
+        return hexdigest in self.base and hexdigest not in self.removed
+
+    def __len__(self) -> int:
+        return len(self.base) - len(self.removed) + len(self.added)
+
+    @property
+    def overlay_size(self) -> int:
+        return len(self.added) + len(self.removed)
+
+    def apply(self, version: int, added: Iterable[str], removed: Iterable[str]) -> "SignatureSet":
+        added   = frozenset(added)
+        removed = frozenset(removed) - added
+        new_added   = (self.added - removed) | {h for h in added if h not in self.base}
+        new_removed = (self.removed - added) | {h for h in removed if h in self.base}
+        return SignatureSet(version, self.base, frozenset(new_added), frozenset(new_removed))
+
+    def compacted(self) -> "SignatureSet":
+        """Влить оверлеи в базу — O(N), выполняется вне пути поиска."""
+        return SignatureSet(self.version, frozenset((self.base - self.removed) | self.added))
+
+
+def parse_delta(lines: Iterable[str]):
+    """
+    Разобрать дельту фида: '+hash' — добавить, '-hash' — удалить,
+    строка без префикса — добавить. Пустые строки и '#' пропускаются.
+    """
+    added, removed = set(), set()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line[0] == "-":
+            removed.add(line[1:].strip().lower())
+        else:
+            added.add(line.lstrip("+").strip().lower())
+    return added, removed
+
+
 class HashUtils:
+    # Оверлей дельт больше этой доли базы — пора сливать в фоне
+    COMPACT_RATIO = 0.05
+    COMPACT_MIN   = 100_000
+
     def __init__(self, db_path: str = "blackice.db"):
         self.db_path = Path(db_path)
-        self.known_hashes = set()
+        self._signatures  = SignatureSet(0, frozenset())
+        self._write_lock  = threading.Lock()
+        self._compact_lock = threading.Lock()
         self._load_signatures()
 
+    @property
+    def known_hashes(self) -> SignatureSet:
+        return self._signatures
+
+    def snapshot(self) -> SignatureSet:
+        """Текущая версия сигнатур; скан держит её до конца, даже если вышла новая."""
+        return self._signatures
+
     def _load_signatures(self):
+        # Чтение и подмена под одной блокировкой: apply_delta, пришедший
+        # между ними, иначе потерялся бы в памяти
+        with self._write_lock:
+            self._read_signatures()
+
+    def _read_signatures(self):
+        """Перечитать сигнатуры из БД; вызывается под _write_lock."""
         try:
             conn = sqlite3.connect(str(self.db_path))
-            cur = conn.execute("SELECT hash FROM signatures")
-            self.known_hashes = {row[0] for row in cur}
-            conn.close()
+            try:
+                base    = frozenset(row[0] for row in conn.execute("SELECT hash FROM signatures"))
+                version = self._db_version(conn)
+            finally:
+                conn.close()
         except Exception as e:
             logger.error(f"Cannot load signatures from DB: {e}")
-            self.known_hashes = set()
+            base, version = frozenset(), 0
+        self._signatures = SignatureSet(version, base)
+
+    @staticmethod
+    def _db_version(conn) -> int:
+        try:
+            row = conn.execute("SELECT MAX(version) FROM signature_versions").fetchone()
+        except sqlite3.OperationalError:
+            return 0
+        return row[0] or 0
+
+    def apply_delta(self, added: Iterable[str], removed: Iterable[str] = (), persist: bool = True) -> int:
+        """
+        Применить дельту фида: записать её в БД одной транзакцией и атомарно
+        подменить снимок. Возвращает номер новой версии.
+        """
+        added   = {h.strip().lower() for h in added if h and h.strip()}
+        removed = {h.strip().lower() for h in removed if h and h.strip()} - added
+        with self._write_lock:
+            current = self._signatures
+            version = current.version + 1
+            if persist:
+                # Номер версии берётся из БД в той же транзакции: БД могут
+                # обновлять и другие экземпляры HashUtils (апдейтер фида и т.п.)
+                conn = sqlite3.connect(str(self.db_path), isolation_level=None)
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        version = self._db_version(conn) + 1
+                        conn.executemany("DELETE FROM signatures WHERE hash = ?", ((h,) for h in removed))
+                        conn.executemany("INSERT OR IGNORE INTO signatures(hash) VALUES (?)", ((h,) for h in added))
+                        conn.execute(
+                            "INSERT INTO signature_versions(version, applied_at, added, removed) "
+                            "VALUES (?, datetime('now'), ?, ?)",
+                            (version, len(added), len(removed))
+                        )
+                        conn.execute("COMMIT")
+                    except BaseException:
+                        conn.execute("ROLLBACK")
+                        raise
+                finally:
+                    conn.close()
+            if version == current.version + 1:
+                # Присваивание ссылки атомарно: читатели видят либо старую, либо новую версию
+                self._signatures = current.apply(version, added, removed)
+            else:
+                # Между нашей загрузкой и этой дельтой БД обновлял кто-то ещё —
+                # в снимке их дельт нет, перечитываем сигнатуры целиком
+                logger.info(f"Signatures changed outside this process "
+                            f"(v{current.version} -> v{version}), reloading")
+                self._read_signatures()
+            needs_compact = self._signatures.overlay_size > max(
+                self.COMPACT_MIN, len(self._signatures.base) * self.COMPACT_RATIO
+            )
+        logger.info(f"Signatures v{version}: +{len(added)} -{len(removed)}")
+        if needs_compact:
+            threading.Thread(target=self.compact, daemon=True).start()
+        return version
+
+    def apply_delta_file(self, path: str) -> int:
+        with open(path, encoding="utf-8") as f:
+            added, removed = parse_delta(f)
+        return self.apply_delta(added, removed)
+
+    def compact(self):
+        """
+        Слить оверлеи в новую базу. Сборка идёт без блокировки, поэтому дельты,
+        пришедшие за это время, переносятся поверх новой базы при подмене.
+        Если за это время базу заменила полная перезагрузка, результат устарел
+        и отбрасывается.
+        """
+        if not self._compact_lock.acquire(blocking=False):
+            return
+        try:
+            snap   = self._signatures
+            merged = snap.compacted()
+            with self._write_lock:
+                cur = self._signatures
+                if cur.base is not snap.base:
+                    return
+                if cur is not snap:
+                    # Перенести разницу между cur и новой базой в оверлеи
+                    merged = merged.apply(
+                        cur.version,
+                        cur.added | (snap.removed - cur.removed),
+                        cur.removed | (snap.added - cur.added),
+                    )
+                self._signatures = merged
+        finally:
+            self._compact_lock.release()
+
+    @staticmethod
+    def _new_hasher(method: str):
+        algo = method.lower()
+        if algo == "md5":
+            return hashlib.md5()
+        if algo == "sha1":
+            return hashlib.sha1()
+        if algo == "sha256":
+            return hashlib.sha256()
+        if algo == "ssdeep":
+            return FuzzyHasher()
+        raise ValueError(f"Unsupported hash method: {method}")
 
     @staticmethod
     def compute_hash(
         filepath: str,
-        method: Literal["md5", "sha1", "sha256"] = "md5",
+        method: Literal["md5", "sha1", "sha256", "ssdeep"] = "md5",
         chunk_size: int = 8192
     ) -> Optional[str]:
-        algo = method.lower()
-        if algo == "md5":
-            h = hashlib.md5()
-        elif algo == "sha1":
-            h = hashlib.sha1()
-        elif algo == "sha256":
-            h = hashlib.sha256()
-        else:
-            raise ValueError(f"Unsupported hash method: {method}")
+        return HashUtils.compute_hashes(filepath, (method,), chunk_size).get(method)
 
+    @staticmethod
+    def compute_hashes(
+        filepath: str,
+        methods: Iterable[str] = ("md5", "sha1", "sha256"),
+        chunk_size: int = 65536,
+        should_stop: Optional[Callable[[], bool]] = None,
+        io_mode: str = IO_BUFFERED,
+        throttle: Optional[Throttle] = None
+    ) -> Dict[str, Optional[str]]:
+        """
+        Посчитать несколько дайджестов за один проход по файлу.
+        should_stop проверяется на каждом чанке; при True — ScanCancelled.
+        io_mode/throttle — см. file_io.read_chunks.
+        """
+        hashers = {m: HashUtils._new_hasher(m) for m in methods}
         try:
-            with open(filepath, "rb") as f:
-                for chunk in iter(lambda: f.read(chunk_size), b""):
+            for chunk in read_chunks(filepath, io_mode, chunk_size, throttle, should_stop):
+                for h in hashers.values():
                     h.update(chunk)
-            return h.hexdigest()
+            return {m: h.hexdigest() for m, h in hashers.items()}
+        except ScanCancelled:
+            raise
         except Exception as e:
             logger.warning(f"Hash compute failed for {filepath}: {e}")
-            return None
+            return {m: None for m in hashers}
 
     def is_known(self, hexdigest: str) -> bool:
         if not hexdigest:
             return False
-        return hexdigest.lower() in self.known_hashes
+        return hexdigest.lower() in self._signatures
 
     def reload_signatures(self):
-        """Перезагрузить сигнатуры из БД заново."""
+        """Полностью перечитать сигнатуры из БД и атомарно подменить снимок."""
         self._load_signatures()
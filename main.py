@@ -9,6 +9,7 @@ from constants import WINDOW_STYLE, SIDEBAR_STYLE, HEADER_STYLE, CONTENT_STYLE
 from config import ConfigManager
 from db_manager import DatabaseManager
 from gui import MainWindow
+from maintenance import MaintenanceWorker
 
 def _get_short_path(path: str) -> str:
     buf = ctypes.create_unicode_buffer(260)
@@ -35,8 +36,14 @@ def main():
     db  = DatabaseManager(cfg.get("db_path"))
 
     window = MainWindow(config=cfg, db_manager=db)
+    app.aboutToQuit.connect(window.stop_export)
     window.show()
 
+    # 3) Фоновое обслуживание БД (ретенция логов, вакуум)
+    maintenance = MaintenanceWorker(db, cfg)
+    maintenance.start()
+    app.aboutToQuit.connect(lambda: (maintenance.stop(), maintenance.wait()))
+
     sys.exit(app.exec())
 
 if __name__ == "__main__":
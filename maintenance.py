@@ -0,0 +1,61 @@
+# maintenance.py
+
+import logging
+
+from PySide6.QtCore import QThread
+
+logger = logging.getLogger(__name__)
+
+# Порции удаления/вакуума и пауза между ними — чтобы не держать lock БД
+BATCH_SIZE   = 500
+BATCH_PAUSE  = 0.05
+VACUUM_PAGES = 256
+
+
+def run_maintenance(db_manager, config, should_stop=None) -> dict:
+    """
+    Один проход обслуживания БД: ретенция логов, лимит на скан, вакуум, optimize.
+    should_stop проверяется между порциями — остановка не ждёт конца прохода.
+    """
+    stats = {
+        "purged": db_manager.purge_logs_older_than(
+            int(config.get("log_retention_days")), BATCH_SIZE, BATCH_PAUSE, should_stop
+        ),
+        "capped": db_manager.cap_scan_logs(
+            int(config.get("max_logs_per_scan")), BATCH_SIZE, BATCH_PAUSE, should_stop
+        ),
+        "vacuumed_pages": db_manager.incremental_vacuum(
+            VACUUM_PAGES, pause=BATCH_PAUSE, should_stop=should_stop
+        ),
+    }
+    if should_stop is not None and should_stop():
+        logger.info(f"DB maintenance interrupted: {stats}")
+        return stats
+    db_manager.optimize()
+    logger.info(f"DB maintenance: {stats}")
+    return stats
+
+
+class MaintenanceWorker(QThread):
+    """Фоновое обслуживание БД раз в maintenance_interval секунд."""
+
+    def __init__(self, db_manager, config):
+        super().__init__()
+        self.db       = db_manager
+        self.config   = config
+        self._running = True
+
+    def stop(self):
+        self._running = False
+
+    def run(self):
+        while self._running:
+            try:
+                run_maintenance(self.db, self.config, lambda: not self._running)
+            except Exception as e:
+                logger.error(f"DB maintenance failed: {e}")
+            # Спим короткими шагами, чтобы stop() срабатывал быстро
+            remaining = int(float(self.config.get("maintenance_interval")) * 1000)
+            while self._running and remaining > 0:
+                self.msleep(min(remaining, 200))
+                remaining -= 200
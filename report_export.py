@@ -0,0 +1,189 @@
+# report_export.py
+
+import csv
+import json
+import logging
+from pathlib import Path
+from typing import Optional, Callable
+
+from PySide6.QtCore import QThread, Signal
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "jsonl", "sarif")
+
+SARIF_SCHEMA  = "https://json.schemastore.org/sarif-2.1.0.json"
+SARIF_LEVELS  = {
+    "High":    "error",
+    "Medium":  "warning",
+    "Low":     "note",
+    "Unknown": "note",
+    "Clean":   "none",
+}
+CSV_COLUMNS = ("id", "path", "level", "detail", "stage", "type", "sha256", "meta")
+# С этих символов Excel/Calc начинают формулу — имена файлов задаёт атакующий
+_CSV_FORMULA_CHARS = ("=", "+", "-", "@", "\t", "\r")
+
+
+def detect_format(out_path: str) -> str:
+    name = Path(out_path).name.lower()
+    if name.endswith((".sarif", ".sarif.json")):
+        return "sarif"
+    if name.endswith(".jsonl"):
+        return "jsonl"
+    return "csv"
+
+
+def _record(row) -> dict:
+    try:
+        meta = json.loads(row["meta"]) if row["meta"] else {}
+    except ValueError:
+        meta = {}
+    return {
+        "id":     row["id"],
+        "path":   row["path"],
+        "level":  row["level"],
+        "detail": row["detail"] or "",
+        "meta":   meta,
+    }
+
+
+def _csv_cell(value: str) -> str:
+    return "'" + value if value.startswith(_CSV_FORMULA_CHARS) else value
+
+
+def _write_csv(f, records, scan):
+    writer = csv.writer(f)
+    writer.writerow(CSV_COLUMNS)
+    for rec in records:
+        meta = rec["meta"]
+        writer.writerow((
+            rec["id"], _csv_cell(rec["path"]), rec["level"], _csv_cell(rec["detail"]),
+            meta.get("stage", ""), meta.get("type", ""),
+            (meta.get("hashes") or {}).get("sha256") or "",
+            json.dumps(meta, ensure_ascii=False),
+        ))
+        yield
+
+
+def _write_jsonl(f, records, scan):
+    for rec in records:
+        f.write(json.dumps({"scan_id": scan["id"], **rec}, ensure_ascii=False))
+        f.write("\n")
+        yield
+
+
+def _uri(path: str) -> str:
+    p = Path(path)
+    return p.as_uri() if p.is_absolute() else path
+
+
+def _write_sarif(f, records, scan):
+    # Обёртка пишется вручную, результаты — по одному: память не растёт
+    head = {
+        "$schema": SARIF_SCHEMA,
+        "version": "2.1.0",
+    }
+    run = {
+        "tool": {"driver": {"name": "BlackICE", "informationUri": "https://github.com/biophonk/BlackICE"}},
+        "invocations": [{
+            "executionSuccessful": scan.get("end_time") is not None,
+            "startTimeUtc": scan.get("start_time"),
+            "endTimeUtc":   scan.get("end_time"),
+        }],
+        "properties": {"scanId": scan["id"], "target": scan["path"]},
+    }
+    f.write(json.dumps(head)[:-1] + ', "runs": [')
+    f.write(json.dumps(run)[:-1] + ', "results": [\n')
+    first = True
+    for rec in records:
+        meta   = rec["meta"]
+        result = {
+            "ruleId":  meta.get("stage") or rec["level"],
+            "level":   SARIF_LEVELS.get(rec["level"], "note"),
+            "message": {"text": rec["detail"] or rec["level"]},
+            "locations": [{"physicalLocation": {"artifactLocation": {"uri": _uri(rec["path"])}}}],
+            "properties": {"blackiceLevel": rec["level"], **meta},
+        }
+        if not first:
+            f.write(",\n")
+        f.write(json.dumps(result, ensure_ascii=False))
+        first = False
+        yield
+    f.write("\n]}]}\n")
+
+
+_WRITERS = {
+    "csv":   _write_csv,
+    "jsonl": _write_jsonl,
+    "sarif": _write_sarif,
+}
+
+
+def export_scan(db_manager, scan_id: int, out_path: str, fmt: Optional[str] = None,
+                chunk_size: int = 1000,
+                should_stop: Optional[Callable[[], bool]] = None) -> int:
+    """
+    Выгрузить алерты скана в CSV / JSONL / SARIF.
+    Строки читаются курсором порциями по chunk_size и сразу пишутся в файл,
+    поэтому расход памяти не зависит от числа алертов. Возвращает число записей.
+    """
+    fmt = (fmt or detect_format(out_path)).lower()
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    scan = db_manager.get_scan(scan_id)
+    if scan is None:
+        raise ValueError(f"Scan #{scan_id} not found")
+
+    rows      = db_manager.iter_alerts(scan_id, chunk_size)
+    records   = (_record(row) for row in rows)
+    tmp       = Path(f"{out_path}.tmp")
+    count     = 0
+    cancelled = False
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="" if fmt == "csv" else "\n") as f:
+            for _ in _WRITERS[fmt](f, records, scan):
+                count += 1
+                if should_stop is not None and count % chunk_size == 0 and should_stop():
+                    cancelled = True
+                    break
+        if not cancelled:
+            tmp.replace(out_path)
+    except BaseException:
+        # Диск переполнен, ошибка БД и т.п. — недописанный файл не оставляем
+        tmp.unlink(missing_ok=True)
+        raise
+    finally:
+        rows.close()
+
+    if cancelled:
+        tmp.unlink(missing_ok=True)
+        logger.info(f"Export of scan #{scan_id} cancelled after {count} alerts")
+        return count
+    logger.info(f"Exported {count} alerts of scan #{scan_id} to {out_path} ({fmt})")
+    return count
+
+
+class ExportWorker(QThread):
+    done   = Signal(int)
+    failed = Signal(str)
+
+    def __init__(self, db_manager, scan_id: int, out_path: str, fmt: str = None):
+        super().__init__()
+        self.db       = db_manager
+        self.scan_id  = scan_id
+        self.out_path = out_path
+        self.fmt      = fmt
+        self._running = True
+
+    def stop(self):
+        self._running = False
+
+    def run(self):
+        try:
+            count = export_scan(self.db, self.scan_id, self.out_path, self.fmt,
+                                should_stop=lambda: not self._running)
+            self.done.emit(count)
+        except Exception as e:
+            logger.error(f"Export failed: {e}")
+            self.failed.emit(str(e))
@@ -1,15 +1,35 @@
 import os
-import asyncio
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from PySide6.QtCore import QThread, Signal
 
-from hash_utils import HashUtils
+from hash_utils import HashUtils, ScanCancelled
+from file_io import Throttle, IO_MODES, IO_BUFFERED
 from vt_api import VirusTotalAPI
+from yara_manager import scan_yara
+from dedup import DuplicateIndex
+from file_types import classify, stages_for, STAGE_SIGNATURES, STAGE_FUZZY, STAGE_YARA, STAGE_VT
+from fuzzy_index import FUZZY_AVAILABLE
+from scheduler import prioritize
 
-def list_files(root: str) -> list[str]:
+logger = logging.getLogger(__name__)
+
+# Как часто проверять флаг остановки, пока ждём сетевой ответ
+CANCEL_POLL_INTERVAL = 0.05
+
+DIGESTS = ("md5", "sha1", "sha256")
+
+def list_files(root: str, should_stop=None) -> list[str]:
     files = []
     if os.path.isdir(root):
-        for dp, _, names in os.walk(root):
-            for fn in names:
+        # Сортировка делает порядок обхода стабильным между запусками
+        for dp, dirs, names in os.walk(root):
+            if should_stop is not None and should_stop():
+                break
+            dirs.sort()
+            for fn in sorted(names):
                 files.append(os.path.join(dp, fn))
     else:
         files = [root]
@@ -17,61 +37,217 @@ def list_files(root: str) -> list[str]:
 
 class ScanWorker(QThread):
     progress     = Signal(int)
-    file_scanned = Signal(str, str)
+    file_scanned = Signal(str, str, str, str)  # path, level, detail, meta (JSON)
     log          = Signal(str)
     finished     = Signal()
 
-    def __init__(self, target_path: str, vt_api_key: str = None):
+    def __init__(self, target_path: str, vt_api_key: str = None, routes: dict = None,
+                 db_manager=None, scan_id: int = None, resume: bool = False,
+                 checkpoint_interval: float = 2.0, priority: dict = None,
+                 hash_utils: HashUtils = None, allowlist=None,
+                 io_mode: str = IO_BUFFERED, io_chunk_size: int = 65536,
+                 io_throttle: int = 0, fuzzy_index=None, fuzzy_threshold: int = 60):
         super().__init__()
         self.target_path = target_path
+        self.routes      = routes
+        self.priority    = priority
+        # Чекпоинты пишутся, только если передан менеджер БД и id скана
+        self.db          = db_manager
+        self.scan_id     = scan_id
+        self.resume      = resume
+        self.checkpoint_interval = checkpoint_interval
         self._running    = True
-        self.hash_utils  = HashUtils()
+        # Общий HashUtils позволяет обновлять сигнатуры без пересоздания воркера
+        self.hash_utils  = hash_utils or HashUtils()
+        self.signatures  = None
+        # AllowlistIndex известных чистых файлов (или None)
+        self.allowlist   = allowlist
+        if io_mode not in IO_MODES:
+            raise ValueError(f"Unsupported I/O mode: {io_mode}")
+        # Режим чтения для хеширования и общий на весь скан лимит байт/с
+        self.io_mode       = io_mode
+        self.io_chunk_size = io_chunk_size
+        self.io_throttle   = Throttle(io_throttle) if io_throttle else None
+        # FuzzyIndex вариантов известных семейств (нужен пакет ssdeep)
+        self.fuzzy_index     = fuzzy_index if FUZZY_AVAILABLE else None
+        self.fuzzy_threshold = fuzzy_threshold
         # VirusTotalAPI теперь принимает ключ по имени api_key
         self.vt_api      = VirusTotalAPI(api_key=vt_api_key)
+        # Сетевой запрос идёт в отдельном потоке, чтобы stop() не ждал его таймаута
+        self._vt_pool    = ThreadPoolExecutor(max_workers=1)
 
     def stop(self):
         self._running = False
 
+    def _should_stop(self) -> bool:
+        return not self._running
+
     def run(self):
-        files = list_files(self.target_path)
-        total = len(files)
-        for i, fpath in enumerate(files, 1):
+        # Скан до конца работает на одной версии сигнатур
+        self.signatures = self.hash_utils.snapshot()
+        self.log.emit(f"Signatures v{self.signatures.version}: {len(self.signatures)} entries")
+        files = list_files(self.target_path, self._should_stop)
+        done  = set()
+        if self.resume and self.db is not None and self.scan_id is not None:
+            done = self.db.get_completed_files(self.scan_id)
+            self.log.emit(f"Resuming scan #{self.scan_id}: {len(done)} files already done")
+        total   = len(files)
+        files   = [f for f in files if f not in done]
+        skipped = total - len(files)
+
+        dups  = DuplicateIndex()
+        file_stats = {}
+        for fpath in files:
             if not self._running:
                 break
-            self.log.emit(f"Scanning: {fpath}")
             try:
-                # 1) Hashes
-                hashes = {
-                    algo: self.hash_utils.compute_hash(fpath, algo)
-                    for algo in ("md5", "sha1", "sha256")
-                }
-                if any(self.hash_utils.is_known(h or "") for h in hashes.values()):
-                    level, detail = "High", "Known malicious hash"
-                else:
-                    # 2) YARA (отключите/заглушите при необходимости)
-                    hits = []
-                    level, detail = ("Medium", f"YARA: {', '.join(hits)}") if hits else (None, None)
-                    if level is None:
-                        # 3) VirusTotal
-                        key = hashes.get("sha256") or hashes.get("md5") or ""
-                        vt = asyncio.run(self.vt_api.check_file(key))
-                        stats = (
-                            vt.get("data", {})
-                              .get("attributes", {})
-                              .get("last_analysis_stats", {})
-                        ) if vt else {}
-                        if stats.get("malicious", 0) > 0:
-                            level, detail = "High", "VT malicious"
-                        elif stats.get("suspicious", 0) > 0:
-                            level, detail = "Medium", "VT suspicious"
-                        else:
-                            level, detail = "Clean", "No threats"
-
-                self.file_scanned.emit(fpath, level)
-                self.log.emit(detail)
-            except Exception as e:
-                self.log.emit(f"Error: {e}")
-                self.file_scanned.emit(fpath, "Unknown")
-
-            self.progress.emit(int(i / total * 100))
+                file_stats[fpath] = os.stat(fpath)
+                dups.add_size(file_stats[fpath].st_size)
+            except OSError:
+                pass
+        files = prioritize(files, file_stats, self.priority)
+
+        pending = []
+        done_n  = skipped
+        last_cp = time.monotonic()
+        try:
+            for i, fpath in enumerate(files, skipped + 1):
+                if not self._running:
+                    break
+                self.log.emit(f"Scanning: {fpath}")
+                meta = {}
+                try:
+                    st = file_stats.get(fpath) or os.stat(fpath)
+                    meta["size"] = st.st_size
+                    verdict = dups.by_inode(fpath, st)
+                    if verdict:
+                        level, detail = verdict
+                        detail = f"{detail} (hardlink)"
+                        meta["stage"] = "dedup"
+                    else:
+                        level, detail = self._analyze(fpath, st, dups, meta)
+                    self.log.emit(detail)
+                except ScanCancelled:
+                    self.log.emit(f"Cancelled: {fpath}")
+                    break
+                except Exception as e:
+                    self.log.emit(f"Error: {e}")
+                    meta["error"] = str(e)
+                    level, detail = "Unknown", f"Error: {e}"
+
+                result = (fpath, level, detail, json.dumps(meta))
+                self.file_scanned.emit(*result)
+                pending.append(result)
+                done_n = i
+                if time.monotonic() - last_cp >= self.checkpoint_interval:
+                    if self._checkpoint(done_n, total, pending):
+                        pending = []
+                    last_cp = time.monotonic()
+
+                self.progress.emit(int(i / total * 100))
+        finally:
+            self._checkpoint(done_n, total, pending)
+            self._vt_pool.shutdown(wait=False, cancel_futures=True)
         self.finished.emit()
+
+    def _checkpoint(self, done: int, total: int, results: list) -> bool:
+        """
+        Записать вердикты и прогресс одной транзакцией: файл считается
+        обработанным, только если его вердикт сохранён. При ошибке вердикты
+        остаются в очереди до следующего чекпоинта.
+        """
+        if self.db is None or self.scan_id is None:
+            return True
+        try:
+            self.db.checkpoint_scan(self.scan_id, done, total, results)
+        except Exception as e:
+            logger.error(f"Checkpoint failed for scan #{self.scan_id}: {e}")
+            return False
+        return True
+
+    def _analyze(self, fpath: str, st: os.stat_result, dups: DuplicateIndex, meta: dict):
+        """Прогнать файл по этапам; meta заполняется данными этапов для отчётов."""
+        # 0) Тип файла определяет, какие этапы запускать
+        ftype  = classify(fpath)
+        stages = stages_for(ftype, self.routes)
+        meta.update(type=ftype, stages=list(stages))
+        logger.info(f"Route {fpath}: {ftype} -> {', '.join(stages) or 'skip'}")
+        if not stages:
+            meta["stage"] = "route"
+            return "Clean", f"No threats ({ftype}: skipped)"
+
+        # 1) Hashes — все дайджесты (и нечёткий хеш) за один проход
+        fuzzy     = self.fuzzy_index is not None and STAGE_FUZZY in stages
+        methods   = DIGESTS + ("ssdeep",) if fuzzy else DIGESTS
+        hashes    = self.hash_utils.compute_hashes(
+            fpath, methods, self.io_chunk_size,
+            should_stop=self._should_stop, io_mode=self.io_mode, throttle=self.io_throttle
+        )
+        meta["hashes"] = hashes
+        if dups.has_same_size(st):
+            verdict = dups.by_content(stages, hashes.get("sha256"))
+            if verdict:
+                meta["stage"] = "dedup"
+                return verdict[0], f"{verdict[1]} (duplicate content)"
+
+        exact = STAGE_SIGNATURES in stages and any(
+            hashes.get(a) and hashes[a].lower() in self.signatures for a in DIGESTS
+        )
+        trusted = not exact and self.allowlist is not None and \
+            self.allowlist.contains(hashes.get(self.allowlist.algo))
+        similar = None
+        if fuzzy and not exact and not trusted:
+            similar = self.fuzzy_index.lookup(hashes.get("ssdeep"), self.fuzzy_threshold)
+
+        if exact:
+            meta["stage"] = STAGE_SIGNATURES
+            level, detail = "High", "Known malicious hash"
+        elif trusted:
+            # Доверенный файл: YARA и VT не нужны
+            meta["stage"] = "allowlist"
+            level, detail = "Clean", "Known good (allowlist)"
+        elif similar is not None:
+            score, family, ref = similar
+            meta.update(stage=STAGE_FUZZY, fuzzy={"score": score, "family": family, "reference": ref})
+            level, detail = "Medium", f"Similar to {family} ({score}%)"
+        else:
+            # 2) YARA (отключите/заглушите при необходимости)
+            hits = scan_yara(fpath) if STAGE_YARA in stages else []
+            if STAGE_YARA in stages:
+                meta.update(stage=STAGE_YARA, yara=hits)
+            level, detail = ("Medium", f"YARA: {', '.join(hits)}") if hits else (None, None)
+            if level is None and STAGE_VT not in stages:
+                meta["stage"] = "route"
+                level, detail = "Clean", f"No threats ({ftype}: VT skipped)"
+            if level is None:
+                # 3) VirusTotal
+                key = hashes.get("sha256") or hashes.get("md5") or ""
+                vt = self._vt_lookup(key)
+                stats = (
+                    vt.get("data", {})
+                      .get("attributes", {})
+                      .get("last_analysis_stats", {})
+                ) if vt else {}
+                meta["stage"] = STAGE_VT
+                meta["vt"]    = stats
+                if stats.get("malicious", 0) > 0:
+                    level, detail = "High", "VT malicious"
+                elif stats.get("suspicious", 0) > 0:
+                    level, detail = "Medium", "VT suspicious"
+                else:
+                    level, detail = "Clean", "No threats"
+
+        dups.record(fpath, st, stages, hashes.get("sha256"), (level, detail))
+        return level, detail
+
+    def _vt_lookup(self, hexdigest: str):
+        """Запрос к VT, прерываемый stop() без ожидания сетевого таймаута."""
+        future = self._vt_pool.submit(self.vt_api.check_file, hexdigest)
+        while True:
+            if not self._running:
+                future.cancel()
+                raise ScanCancelled(hexdigest)
+            try:
+                return future.result(timeout=CANCEL_POLL_INTERVAL)
+            except FutureTimeout:
+                continue
@@ -0,0 +1,73 @@
+# scheduler.py
+
+import os
+import stat
+import time
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Правила приоритета по умолчанию; переопределяются настройкой scan_priority
+DEFAULT_RULES = {
+    "executable_extensions": [
+        ".exe", ".dll", ".sys", ".scr", ".com", ".cpl", ".msi", ".ocx",
+        ".ps1", ".vbs", ".js", ".jse", ".wsf", ".hta", ".bat", ".cmd",
+        ".jar", ".apk", ".so", ".dylib", ".elf", ".sh", ".py",
+    ],
+    "writable_locations": [
+        "downloads", "desktop", "temp", "tmp", "appdata", "public",
+        "startup", "cache",
+    ],
+    "recent_days": 7,
+    "weights": {
+        "executable":        100,
+        "posix_executable":  60,
+        "writable_location": 50,
+        "recent":            30,
+    },
+}
+
+
+def merge_rules(overrides: Optional[dict] = None) -> dict:
+    rules = {**DEFAULT_RULES, **(overrides or {})}
+    rules["weights"] = {**DEFAULT_RULES["weights"], **(overrides or {}).get("weights", {})}
+    return rules
+
+
+def risk_score(path: str, st: Optional[os.stat_result], rules: dict, now: float) -> int:
+    """Чем выше балл, тем раньше файл попадёт в очередь сканирования."""
+    weights = rules["weights"]
+    score   = 0
+    ext = os.path.splitext(path)[1].lower()
+    if ext in rules["executable_extensions"]:
+        score += weights["executable"]
+    elif st is not None and stat.S_ISREG(st.st_mode) and st.st_mode & 0o111:
+        score += weights["posix_executable"]
+
+    parts = {p.lower() for p in path.replace("\\", "/").split("/")}
+    if parts.intersection(rules["writable_locations"]):
+        score += weights["writable_location"]
+
+    if st is not None and now - st.st_mtime <= rules["recent_days"] * 86400:
+        score += weights["recent"]
+    return score
+
+
+def prioritize(files: List[str], file_stats: Dict[str, os.stat_result],
+               rules: Optional[dict] = None) -> List[str]:
+    """
+    Упорядочить файлы: сначала рискованные, внутри одного балла — маленькие.
+    Файлы без stat уходят в конец.
+    """
+    rules = merge_rules(rules)
+    now   = time.time()
+
+    def key(path):
+        st = file_stats.get(path)
+        size = st.st_size if st is not None else float("inf")
+        return -risk_score(path, st, rules, now), size
+
+    ordered = sorted(files, key=key)
+    logger.info(f"Scheduled {len(ordered)} files by risk/size")
+    return ordered
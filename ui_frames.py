@@ -39,7 +39,8 @@ class ScanFrame(QtWidgets.QWidget):
         btn_layout = QtWidgets.QHBoxLayout()
         self.btn_file = QtWidgets.QPushButton("Scan File")
         self.btn_folder = QtWidgets.QPushButton("Scan Folder")
-        for btn in (self.btn_file, self.btn_folder):
+        self.btn_resume = QtWidgets.QPushButton("Resume Scan")
+        for btn in (self.btn_file, self.btn_folder, self.btn_resume):
             btn.setFixedHeight(40)
             btn.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
             btn.setStyleSheet(f"color:{TEXT_COLOR};font-size:14px;border:1px solid {TEXT_COLOR};border-radius:5px;")
@@ -73,6 +74,12 @@ class AlertFrame(QtWidgets.QWidget):
         hdr.resizeSection(1, 24)                                              # 24px for the color square
         layout.addWidget(self.tree)
 
+        self.export_btn = QtWidgets.QPushButton("Export Report")
+        self.export_btn.setFixedHeight(35)
+        self.export_btn.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.export_btn.setStyleSheet(f"color:{TEXT_COLOR};font-size:14px;border:1px solid {TEXT_COLOR};border-radius:5px;")
+        layout.addWidget(self.export_btn)
+
     def add_alert(self, path: str, level: str):
         item = QtWidgets.QTreeWidgetItem([path, ""])
         item.setTextAlignment(0, QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter)